@@ -1,16 +1,47 @@
 from django.contrib import admin
+from django.db.models import Q
 from .models import Payment, PaymentRefund
 
 
+class ChangelistDeferMixin:
+    """Skip wide TEXT/JSON columns the changelist never renders."""
+    changelist_deferred_fields = ()
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        # Only the list page; change forms still need every column
+        match = request.resolver_match
+        if match and match.url_name == f'{self.opts.app_label}_{self.opts.model_name}_changelist':
+            qs = qs.defer(*self.changelist_deferred_fields)
+        return qs
+
+
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ChangelistDeferMixin, admin.ModelAdmin):
     list_display = ('id', 'order', 'payment_method', 'amount', 'status', 'created_at')
     list_filter = ('status', 'payment_method')
-    search_fields = ('order__order_number', 'transaction_id')
+    list_select_related = ('order', 'user')
+    changelist_deferred_fields = ('payment_url', 'provider_data')
+    search_fields = ('order_number', 'transaction_id')
+    autocomplete_fields = ('order', 'user')
     readonly_fields = ('id', 'created_at', 'updated_at', 'paid_at')
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Both fields are opaque identifiers: exact/prefix matches use their
+        # btree indexes instead of LIKE '%...%' scans
+        terms = search_term.split()
+        if not terms:
+            return queryset, False
+        query = Q()
+        for term in terms:
+            query |= Q(transaction_id=term) | Q(order_number__startswith=term.upper())
+        return queryset.filter(query), False
 
 
 @admin.register(PaymentRefund)
-class PaymentRefundAdmin(admin.ModelAdmin):
+class PaymentRefundAdmin(ChangelistDeferMixin, admin.ModelAdmin):
     list_display = ('id', 'payment', 'amount', 'status', 'created_at')
     list_filter = ('status',)
+    list_select_related = ('payment',)
+    raw_id_fields = ('payment',)
+    changelist_deferred_fields = ('provider_data', 'payment__payment_url', 'payment__provider_data')
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_method',
+            field=models.CharField(choices=[('stripe', 'Stripe'), ('vnpay', 'VNPay'), ('momo', 'MoMo'), ('cod', 'COD')], db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Đang chờ'), ('processing', 'Đang xử lý'), ('completed', 'Hoàn thành'), ('failed', 'Thất bại'), ('cancelled', 'Đã hủy'), ('refunded', 'Đã hoàn tiền')], db_index=True, default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_alter_payment_payment_method_alter_payment_status'),
+        ('sales', '0002_add_ghn_shipping_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['order', 'status'], name='billing_pay_order_i_947ba6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-created_at'], name='billing_pay_user_id_c9be81_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', '-created_at'], name='billing_pay_status_bc3ae3_idx'),
+        ),
+    ]
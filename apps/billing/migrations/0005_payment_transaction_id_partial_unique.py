@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0004_add_payment_indexes'),
+        ('sales', '0002_add_ghn_shipping_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('transaction_id__isnull', False)), fields=('transaction_id',), name='uniq_payment_txn_id'),
+        ),
+    ]
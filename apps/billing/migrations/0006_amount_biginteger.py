@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_payment_transaction_id_partial_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='amount',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='paymentrefund',
+            name='amount',
+            field=models.BigIntegerField(),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:23
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_order_number(apps, schema_editor):
+    Payment = apps.get_model('billing', 'Payment')
+    Order = apps.get_model('sales', 'Order')
+    Payment.objects.filter(order_number='').update(
+        order_number=Subquery(Order.objects.filter(pk=OuterRef('order_id')).values('order_number')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_amount_biginteger'),
+        ('sales', '0002_add_ghn_shipping_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='order_number',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_order_number, migrations.RunPython.noop),
+    ]
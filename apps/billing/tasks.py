@@ -0,0 +1,78 @@
+"""Billing background tasks - work handed off after a payment is confirmed."""
+import logging
+import threading
+from typing import Iterable
+from django.utils import timezone
+from django.db.models import F, Sum
+from apps.sales.models import Order
+from apps.shipping.services import GHNService
+from apps.utils.background import run_in_background, run_on_commit
+
+logger = logging.getLogger('apps.billing')
+
+# Orders waiting for GHN creation; ids queued while a drain is pending share it
+_pending_ghn_orders = set()
+_pending_lock = threading.Lock()
+
+
+def queue_ghn_order(order_id: int) -> None:
+    """Queue a paid order for GHN creation, coalescing bursts into one batch."""
+    with _pending_lock:
+        schedule_drain = not _pending_ghn_orders
+        _pending_ghn_orders.add(order_id)
+    if schedule_drain:
+        run_in_background(_drain_ghn_orders)
+
+
+def _drain_ghn_orders() -> None:
+    with _pending_lock:
+        order_ids = list(_pending_ghn_orders)
+        _pending_ghn_orders.clear()
+    create_ghn_orders(order_ids)
+
+
+def create_ghn_orders(order_ids: Iterable[int]) -> None:
+    """Create GHN shipping orders for freshly paid orders."""
+    # Orders that already have a tracking code were handed to GHN before
+    # (e.g. duplicate callback); weight is 500g per item as default
+    orders = (
+        Order.objects.filter(pk__in=order_ids, tracking_code='')
+        .annotate(total_weight=Sum(F('items__quantity') * 500))
+        .prefetch_related('items')
+    )
+    
+    # GHN has no bulk create endpoint; the calls share one keep-alive session
+    for order in orders:
+        try:
+            result = GHNService.create_order(
+                order=order,
+                to_district_id=order.to_district_id,
+                to_ward_code=order.to_ward_code,
+                weight=order.total_weight or 0,
+                cod_amount=0,  # Prepaid order, no COD
+                note=order.note,
+            )
+        except Exception as e:
+            logger.exception(f"Error creating GHN order for {order.order_number}: {e}")
+            continue
+        
+        if result.get('success'):
+            tracking_code = result.get('order_code', '')
+            Order.objects.filter(pk=order.pk).update(tracking_code=tracking_code, updated_at=timezone.now())
+            logger.info(f"GHN order created for {order.order_number}: {tracking_code}")
+        else:
+            logger.error(f"Failed to create GHN order for {order.order_number}: {result.get('error')}")
+
+
+def send_payment_success_email(payment_id) -> None:
+    """Send the payment success email for a confirmed payment."""
+    from apps.identity.services import EmailService
+    from .models import Payment
+    
+    payment = Payment.objects.select_related('order__user').get(pk=payment_id)
+    EmailService.send_payment_success_email(payment)
+
+
+def queue_payment_success_email(payment) -> None:
+    """Send the payment success email off the request thread, after commit."""
+    run_on_commit(send_payment_success_email, payment.pk)
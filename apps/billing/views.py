@@ -1,12 +1,14 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from django.conf import settings
 from django.shortcuts import redirect
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.http import HttpResponse
 from .models import Payment
 from .services import VNPayService, MoMoService, StripeService, PaymentService
+from .tasks import queue_payment_success_email
 import logging
 
 logger = logging.getLogger('apps.billing')
@@ -17,8 +19,6 @@ class VNPayReturnView(APIView):
     permission_classes = (permissions.AllowAny,)
     
     def get(self, request):
-        from django.conf import settings
-        
         # Log incoming params
         params = request.GET.dict()
         logger.info(f"VNPay Return Params: {params}")
@@ -31,21 +31,17 @@ class VNPayReturnView(APIView):
                 payment_id = result['payment_id']
                 logger.info(f"Looking for payment with ID: {payment_id}")
                 
-                payment = Payment.objects.filter(id=payment_id).first()
+                payment = Payment.objects.for_callback(payment_id)
                 if payment:
                     logger.info(f"Payment found: {payment.id}, Status: {payment.status}")
                     
                     if payment.status != 'completed':
                         payment.transaction_id = result.get('transaction_id')
-                        payment.mark_as_completed()
-                        logger.info(f"Payment {payment.id} marked as completed")
-                        
-                        # Send confirmation email
-                        try:
-                            from apps.identity.services import EmailService
-                            EmailService.send_payment_success_email(payment)
-                        except Exception as e:
-                            logger.error(f"Failed to send email: {e}")
+                        if payment.mark_as_completed():
+                            logger.info(f"Payment {payment.id} marked as completed")
+
+                            # Send confirmation email
+                            queue_payment_success_email(payment)
                         
                         return redirect(f"{settings.FRONTEND_URL}/checkout/success?order_number={payment.order.order_number}")
                     else:
@@ -59,9 +55,9 @@ class VNPayReturnView(APIView):
                  # Handle failure/cancellation
                  payment_id = result.get('payment_id')
                  if payment_id:
-                     payment = Payment.objects.filter(id=payment_id).first()
+                     payment = Payment.objects.for_callback(payment_id)
                      if payment:
-                         if payment.status not in ['completed', 'failed', 'cancelled']:
+                         if payment.status not in Payment.FINAL_STATUSES:
                              logger.warning(f"VNPay payment failed for {payment.id}: {result.get('message')}")
                              payment.mark_as_failed(reason=result.get('message'))
                          
@@ -84,18 +80,13 @@ class VNPayVerifyAPIView(APIView):
         result = VNPayService.verify_return(request.data)
         
         if result['success']:
-            payment = Payment.objects.filter(id=result['payment_id']).first()
+            payment = Payment.objects.for_callback(result['payment_id'])
             if payment:
                 if payment.status != 'completed':
                     payment.transaction_id = result.get('transaction_id')
-                    payment.mark_as_completed()
+                    if payment.mark_as_completed():
+                        queue_payment_success_email(payment)
                     
-                    try:
-                        from apps.identity.services import EmailService
-                        EmailService.send_payment_success_email(payment)
-                    except Exception as e:
-                        logger.error(f"Failed to send email: {e}")
-                        
                 return Response({'success': True, 'order_number': payment.order.order_number})
             else:
                 return Response({'success': False, 'message': 'Payment not found'}, status=404)
@@ -111,16 +102,14 @@ class VNPayIPNView(APIView):
         result = VNPayService.verify_return(request.GET.dict())
         
         if result['success']:
-            payment = Payment.objects.filter(id=result['payment_id']).first()
+            payment = Payment.objects.for_callback(result['payment_id'])
             if payment:
                 # Check order amount
                 if int(payment.amount) == result['amount']:
                     if payment.status != 'completed':
                         payment.transaction_id = result.get('transaction_id')
-                        payment.mark_as_completed()
-                        
-                        from apps.identity.services import EmailService
-                        EmailService.send_payment_success_email(payment)
+                        if payment.mark_as_completed():
+                            queue_payment_success_email(payment)
                         
                         logger.info(f"VNPay IPN: Payment {payment.id} confirmed")
                     return Response({"RspCode": "00", "Message": "Confirm Success"})
@@ -140,26 +129,23 @@ class MoMoReturnView(APIView):
     permission_classes = (permissions.AllowAny,)
     
     def get(self, request):
-        from django.conf import settings
         result = MoMoService.verify_return(request.GET.dict())
         
         if result.get('success'):
-            payment = Payment.objects.filter(id=result.get('payment_id')).first()
+            payment = Payment.objects.for_callback(result.get('payment_id'))
             if payment and payment.status != 'completed':
                 payment.transaction_id = result.get('transaction_id')
-                payment.mark_as_completed()
-                
-                from apps.identity.services import EmailService
-                EmailService.send_payment_success_email(payment)
+                if payment.mark_as_completed():
+                    queue_payment_success_email(payment)
                 
                 return redirect(f"{settings.FRONTEND_URL}/checkout/success?order_number={payment.order.order_number}")
         else:
             # Handle failure
             payment_id = result.get('payment_id')
             if payment_id:
-                payment = Payment.objects.filter(id=payment_id).first()
+                payment = Payment.objects.for_callback(payment_id)
                 if payment:
-                    if payment.status not in ['completed', 'failed', 'cancelled']:
+                    if payment.status not in Payment.FINAL_STATUSES:
                         logger.warning(f"MoMo payment failed for {payment.id}: {result.get('message')}")
                         payment.mark_as_failed(reason=result.get('message'))
                     
@@ -179,19 +165,17 @@ class MoMoWebhookView(APIView):
         result = MoMoService.verify_webhook(request.data)
         
         if result.get('success'):
-            payment = Payment.objects.filter(id=result.get('payment_id')).first()
+            payment = Payment.objects.for_callback(result.get('payment_id'))
             if payment and payment.status != 'completed':
                 payment.transaction_id = result.get('transaction_id')
-                payment.mark_as_completed()
-                
-                from apps.identity.services import EmailService
-                EmailService.send_payment_success_email(payment)
+                if payment.mark_as_completed():
+                    queue_payment_success_email(payment)
         else:
             # Handle failure via webhook (e.g. user cancelled)
             payment_id = result.get('payment_id') or request.data.get('orderId')
             if payment_id:
-                payment = Payment.objects.filter(id=payment_id).first()
-                if payment and payment.status not in ['completed', 'failed', 'cancelled']:
+                payment = Payment.objects.for_callback(payment_id)
+                if payment and payment.status not in Payment.FINAL_STATUSES:
                     logger.warning(f"MoMo webhook failed for {payment_id}")
                     payment.mark_as_failed(reason=request.data.get('message', 'Webhook Reported Failure'))
         
@@ -223,7 +207,9 @@ class PaymentStatusView(APIView):
     
     def get(self, request, payment_id):
         try:
-            payment = Payment.objects.get(id=payment_id, user=request.user)
+            payment = Payment.objects.owned_by(request.user).only(
+                'id', 'status', 'amount', 'payment_method', 'created_at', 'paid_at'
+            ).get(id=payment_id)
             return Response({
                 'id': str(payment.id),
                 'status': payment.status,
@@ -266,7 +252,7 @@ class StripeClientSecretView(APIView):
     
     def get(self, request, payment_id):
         try:
-            payment = Payment.objects.get(id=payment_id, user=request.user)
+            payment = Payment.objects.owned_by(request.user).only('id', 'provider_data').get(id=payment_id)
             client_secret = payment.provider_data.get('client_secret')
             
             if not client_secret:
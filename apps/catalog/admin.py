@@ -15,6 +15,13 @@ class CategoryAdmin(admin.ModelAdmin):
     fields = ('parent', 'name', 'slug', 'description', 'image', 'is_active')
     prepopulated_fields = {'slug': ('name',)}
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_product_count()
+
+    @admin.display(description='Số sản phẩm', ordering='active_product_count')
+    def product_count(self, obj):
+        return obj.product_count
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -2,14 +2,23 @@ import django_filters
 from django.db.models import Q
 from .models import Product
 
+# stock_status value -> condition
+STOCK_STATUS_FILTERS = {
+    'out_of_stock': Q(stock=0),
+    'low_stock': Q(stock__gt=0, stock__lte=5),
+    'in_stock': Q(stock__gt=0),
+}
+
+
+# Custom Filter for comma-separated string IN lookup
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    pass
+
+
 class ProductFilter(django_filters.FilterSet):
     min_price = django_filters.NumberFilter(method='filter_min_price')
     max_price = django_filters.NumberFilter(method='filter_max_price')
     
-    # Custom Filter for comma-separated string IN lookup
-    class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
-        pass
-
     brand = CharInFilter(lookup_expr='in')
     category__slug = django_filters.CharFilter(field_name='category__slug')
     stock_status = django_filters.CharFilter(method='filter_stock_status')
@@ -21,28 +30,17 @@ class ProductFilter(django_filters.FilterSet):
     def filter_min_price(self, queryset, name, value):
         if value is None:
             return queryset
-        # If sale_price is set (and > 0), use it; otherwise use price
-        return queryset.filter(
-            Q(sale_price__gt=0, sale_price__gte=value) | 
-            Q(Q(sale_price__isnull=True) | Q(sale_price=0), price__gte=value)
-        )
+        # effective_price = sale_price if set (and > 0), otherwise price
+        return queryset.filter(effective_price__gte=value)
 
     def filter_max_price(self, queryset, name, value):
         if value is None:
             return queryset
-        return queryset.filter(
-            Q(sale_price__gt=0, sale_price__lte=value) | 
-            Q(Q(sale_price__isnull=True) | Q(sale_price=0), price__lte=value)
-        )
+        return queryset.filter(effective_price__lte=value)
 
     def filter_stock_status(self, queryset, name, value):
-        if value == 'out_of_stock':
-            return queryset.filter(stock=0)
-        elif value == 'low_stock':
-            return queryset.filter(stock__gt=0, stock__lte=5)
-        elif value == 'in_stock':
-            return queryset.filter(stock__gt=0)
-        return queryset
+        condition = STOCK_STATUS_FILTERS.get(value)
+        return queryset.filter(condition) if condition is not None else queryset
 
 from rest_framework import filters
 
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(sale_price__gt=0, then=models.F('sale_price')), default=models.F('price')), output_field=models.DecimalField(decimal_places=0, max_digits=12)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price'], name='catalog_pro_effecti_574fdc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'effective_price'], name='catalog_pro_is_acti_926588_idx'),
+        ),
+    ]
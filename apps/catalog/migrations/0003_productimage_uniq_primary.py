@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:35
+
+from django.db import migrations, models
+
+
+def dedupe_primary_images(apps, schema_editor):
+    # Keep one primary per product (first by order, as the storefront shows it)
+    ProductImage = apps.get_model('catalog', 'ProductImage')
+    seen = set()
+    demote = []
+    for image_id, product_id in (
+        ProductImage.objects.filter(is_primary=True)
+        .order_by('product_id', 'order', 'id')
+        .values_list('id', 'product_id')
+    ):
+        if product_id in seen:
+            demote.append(image_id)
+        seen.add(product_id)
+    ProductImage.objects.filter(pk__in=demote).update(is_primary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_primary_images, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_primary', True)), fields=('product',), name='uniq_primary_per_product'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_productimage_uniq_primary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-created_at'], name='catalog_pro_is_acti_ed6a39_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'effective_price'], name='catalog_pro_categor_149659_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand'], name='catalog_pro_brand_f6911e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_featured', True)), fields=['-created_at'], name='catalog_product_featured_idx'),
+        ),
+    ]
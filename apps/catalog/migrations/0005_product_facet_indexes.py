@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'category', 'brand'], name='catalog_pro_is_acti_c0a882_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'category', 'color'], name='catalog_pro_is_acti_2512da_idx'),
+        ),
+    ]
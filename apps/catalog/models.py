@@ -1,14 +1,49 @@
 """Catalog app models - Product and Category."""
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Cast, Floor
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, FileExtensionValidator
 from decimal import Decimal
+from apps.utils.cache import bump_cache_version
 
+CATALOG_CACHE_NAMESPACE = 'catalog'
 
-class Category(models.Model):
+
+class CatalogCacheMixin:
+    """Invalidate cached catalog responses when a row is saved or deleted."""
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_cache_version(CATALOG_CACHE_NAMESPACE)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_cache_version(CATALOG_CACHE_NAMESPACE)
+        return result
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_product_count(self):
+        # One GROUP BY instead of a COUNT per category in lists
+        return self.annotate(
+            active_product_count=models.Count('products', filter=models.Q(products__is_active=True))
+        )
+
+class CategoryManager(models.Manager):
+    def get_queryset(self):
+        return CategoryQuerySet(self.model, using=self._db)
+
+    def with_product_count(self):
+        return self.get_queryset().with_product_count()
+
+
+class Category(CatalogCacheMixin, models.Model):
     """Danh mục sản phẩm với cấu trúc phân cấp."""
     
+    objects = CategoryManager()
+
     name = models.CharField(max_length=100, verbose_name='Tên danh mục')
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -40,6 +75,9 @@ class Category(models.Model):
     
     @property
     def product_count(self):
+        # Use the with_product_count() annotation when the queryset has it
+        if hasattr(self, 'active_product_count'):
+            return self.active_product_count
         return self.products.filter(is_active=True).count()
 
 
@@ -47,15 +85,64 @@ class ProductQuerySet(models.QuerySet):
     def active(self):
         return self.filter(is_active=True)
 
-    def with_effective_price(self):
+    def with_review_stats(self):
+        # Rating/count for a whole page in the listing query, not 2 queries per product
+        return self.annotate(
+            avg_rating=models.Avg('reviews__rating'),
+            reviews_cnt=models.Count('reviews'),
+        )
+
+    def with_discount_percent(self):
+        # Same truncation as Product.discount_percent, computed in the listing query
+        return self.annotate(
+            discount_pct=models.Case(
+                models.When(
+                    sale_price__gt=0, price__gt=0,
+                    then=Cast(
+                        Floor((models.F('price') - models.F('sale_price')) * 100 / models.F('price')),
+                        models.IntegerField(),
+                    ),
+                ),
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            )
+        )
+
+    def with_primary_image(self):
+        # Storage path of the primary image (or first by order), no image rows
         return self.annotate(
-            effective_price=models.Case(
-                models.When(sale_price__gt=0, then=models.F('sale_price')),
-                default=models.F('price'),
-                output_field=models.DecimalField()
+            primary_image_path=models.Subquery(
+                ProductImage.objects.filter(product=models.OuterRef('pk'))
+                .order_by('-is_primary', 'order').values('image')[:1]
             )
         )
 
+    def facets(self):
+        """Price range plus distinct brands/colours, in one grouped query."""
+        # One row per (brand, color) pair present, with that pair's price range
+        rows = (
+            self.order_by('brand', 'color')
+            .values_list('brand', 'color')
+            .annotate(min_price=models.Min('effective_price'), max_price=models.Max('effective_price'))
+        )
+        brands, colors = {}, set()
+        min_price = max_price = None
+        for brand, color, low, high in rows:
+            if brand:
+                brands[brand] = None
+            if color:
+                colors.add(color)
+            if low is not None and (min_price is None or low < min_price):
+                min_price = low
+            if high is not None and (max_price is None or high > max_price):
+                max_price = high
+        return {
+            'min_price': min_price,
+            'max_price': max_price,
+            'brands': list(brands),
+            'colors': sorted(colors),
+        }
+
 class ProductManager(models.Manager):
     def get_queryset(self):
         return ProductQuerySet(self.model, using=self._db)
@@ -63,11 +150,17 @@ class ProductManager(models.Manager):
     def active(self):
         return self.get_queryset().active()
 
-    def with_effective_price(self):
-        return self.get_queryset().with_effective_price()
+    def with_review_stats(self):
+        return self.get_queryset().with_review_stats()
 
+    def with_discount_percent(self):
+        return self.get_queryset().with_discount_percent()
 
-class Product(models.Model):
+    def with_primary_image(self):
+        return self.get_queryset().with_primary_image()
+
+
+class Product(CatalogCacheMixin, models.Model):
     """Sản phẩm trong hệ thống."""
     
     objects = ProductManager()
@@ -87,6 +180,16 @@ class Product(models.Model):
         null=True, blank=True,
         validators=[MinValueValidator(Decimal('0'))]
     )
+    # Giá bán thực tế: sale_price nếu có, ngược lại price. Stored so price
+    # filters and ordering can use an index instead of a CASE per row
+    effective_price = models.GeneratedField(
+        expression=models.Case(
+            models.When(sale_price__gt=0, then=models.F('sale_price')),
+            default=models.F('price'),
+        ),
+        output_field=models.DecimalField(max_digits=12, decimal_places=0),
+        db_persist=True,
+    )
     
     category = models.ForeignKey(
         Category, on_delete=models.CASCADE, related_name='products'
@@ -108,6 +211,22 @@ class Product(models.Model):
         verbose_name = 'Sản phẩm'
         verbose_name_plural = 'Sản phẩm'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['effective_price']),
+            models.Index(fields=['is_active', 'effective_price']),
+            # Default storefront listing: active, newest first
+            models.Index(fields=['is_active', '-created_at']),
+            models.Index(fields=['category', 'effective_price']),
+            models.Index(fields=['brand']),
+            # Brand/colour facets of the filters endpoint (per category)
+            models.Index(fields=['is_active', 'category', 'brand']),
+            models.Index(fields=['is_active', 'category', 'color']),
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(is_active=True, is_featured=True),
+                name='catalog_product_featured_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -123,6 +242,8 @@ class Product(models.Model):
     
     @property
     def discount_percent(self):
+        if hasattr(self, 'discount_pct'):
+            return self.discount_pct
         if self.sale_price and self.price > 0:
             return int(((self.price - self.sale_price) / self.price) * 100)
         return 0
@@ -131,26 +252,30 @@ class Product(models.Model):
     def is_in_stock(self):
         return self.stock > 0
     
-    @property
+    # Query-backed properties are memoized per instance (checkout reads
+    # primary_image up to three times per item); cheap arithmetic ones are not,
+    # since price/stock are edited in place
+    @cached_property
     def primary_image(self):
-        primary = self.images.filter(is_primary=True).first()
-        if primary:
-            return primary.image
-        first = self.images.first()
-        return first.image if first else None
+        image = self.images.order_by('-is_primary', 'order').first()
+        return image.image if image else None
     
-    @property
+    @cached_property
     def average_rating(self):
-        from django.db.models import Avg
-        avg = self.reviews.aggregate(Avg('rating'))['rating__avg']
+        if hasattr(self, 'avg_rating'):
+            avg = self.avg_rating
+        else:
+            avg = self.reviews.aggregate(models.Avg('rating'))['rating__avg']
         return round(avg, 1) if avg else 0
     
-    @property
+    @cached_property
     def review_count(self):
+        if hasattr(self, 'reviews_cnt'):
+            return self.reviews_cnt
         return self.reviews.count()
 
 
-class ProductImage(models.Model):
+class ProductImage(CatalogCacheMixin, models.Model):
     """Hình ảnh sản phẩm."""
     
     product = models.ForeignKey(
@@ -168,11 +293,32 @@ class ProductImage(models.Model):
         verbose_name = 'Hình ảnh sản phẩm'
         verbose_name_plural = 'Hình ảnh sản phẩm'
         ordering = ['order', '-is_primary']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=models.Q(is_primary=True),
+                name='uniq_primary_per_product',
+            ),
+        ]
     
     def __str__(self):
         return f"Image for {self.product.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._was_primary = dict(zip(field_names, values)).get('is_primary', False)
+        return instance
+    
     def save(self, *args, **kwargs):
-        if self.is_primary:
-            ProductImage.objects.filter(product=self.product, is_primary=True).update(is_primary=False)
-        super().save(*args, **kwargs)
+        # Demote the current primary only when this image becomes primary;
+        # the partial unique index guarantees at most one either way
+        if self.is_primary and not getattr(self, '_was_primary', False):
+            with transaction.atomic():
+                ProductImage.objects.filter(
+                    product_id=self.product_id, is_primary=True
+                ).exclude(pk=self.pk).update(is_primary=False)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._was_primary = self.is_primary
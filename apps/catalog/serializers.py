@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Category, Product, ProductImage
+from apps.utils.cache import bump_cache_version
+from .models import CATALOG_CACHE_NAMESPACE, Category, Product, ProductImage
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -42,48 +44,30 @@ class ProductListSerializer(serializers.ModelSerializer):
 
     def get_primary_image(self, obj):
         """
-        Optimized access using prefetched objects to avoid N+1 queries.
-        Assuming 'images' is prefetched in the ViewSet.
+        Primary image, or the first one by order.
+        List querysets annotate its path via with_primary_image(); otherwise use
+        the (possibly prefetched) images in Meta order, primary first.
         """
-        # Try to use the prefetch cache usually populated by prefetch_related
-        # Accessing obj.images.all() keeps the queryset cache if prefetch was done.
-        # DO NOT use filter() here as it hits DB.
-        
-        images = list(obj.images.all())
-        if not images:
-            return None
-            
-        # Find primary in memory
-        primary = next((img for img in images if img.is_primary), None)
-        
-        if primary:
-            # Return absolute URL if request context available, or typically FileField returns url automatically 
-            # but here we return specific object property or letting DRF handle logic if we returned object.
-            # Returning string URL is safest for manual field.
+        if hasattr(obj, 'primary_image_path'):
+            if not obj.primary_image_path:
+                return None
+            url = ProductImage._meta.get_field('image').storage.url(obj.primary_image_path)
+        else:
+            images = sorted(obj.images.all(), key=lambda img: not img.is_primary)
+            if not images:
+                return None
             try:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(primary.image.url)
-                return primary.image.url
+                url = images[0].image.url
             except ValueError:
                 return None
-                
-        # Fallback to first image
-        try:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(images[0].image.url)
-            return images[0].image.url
-        except ValueError:
-            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
     def get_current_price(self, obj):
         """
-        Use effective_price if annotated (View Optimization), otherwise calculate.
+        Use the stored effective_price column.
         """
-        if hasattr(obj, 'effective_price'):
-            return obj.effective_price
-        return obj.sale_price if obj.sale_price else obj.price
+        return obj.effective_price
 
 
 class ProductDetailSerializer(ProductListSerializer):
@@ -100,11 +84,12 @@ class ProductDetailSerializer(ProductListSerializer):
 class ProductCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating products with category ID and image handling."""
     image = serializers.ImageField(write_only=True, required=False)
+    images = serializers.ListField(child=serializers.ImageField(), write_only=True, required=False)
     
     class Meta:
         model = Product
         fields = ('id', 'name', 'slug', 'description', 'price', 'sale_price',
-                  'category', 'stock', 'brand', 'is_featured', 'image', 'sku', 'color', 'is_active', 'attributes')
+                  'category', 'stock', 'brand', 'is_featured', 'image', 'images', 'sku', 'color', 'is_active', 'attributes')
         read_only_fields = ('id', 'slug')
 
     def validate_attributes(self, value):
@@ -128,24 +113,37 @@ class ProductCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Description contains invalid characters")
         return InputValidator.sanitize_html(value) if value else value
 
-    def create(self, validated_data):
+    @staticmethod
+    def _pop_images(validated_data):
         image = validated_data.pop('image', None)
+        images = validated_data.pop('images', None) or []
+        return ([image] if image else []) + list(images)
+
+    @staticmethod
+    def _add_images(product, images, demote_existing=True):
+        """Add uploaded images in one INSERT; the first becomes primary."""
+        if not images:
+            return
+        with transaction.atomic():
+            if demote_existing:
+                ProductImage.objects.filter(product=product, is_primary=True).update(is_primary=False)
+            ProductImage.objects.bulk_create([
+                ProductImage(product=product, image=image, is_primary=(i == 0), order=i)
+                for i, image in enumerate(images)
+            ])
+        # bulk_create skips ProductImage.save(), which normally does this
+        bump_cache_version(CATALOG_CACHE_NAMESPACE)
+
+    def create(self, validated_data):
+        images = self._pop_images(validated_data)
         product = Product.objects.create(**validated_data)
-        
-        if image:
-            ProductImage.objects.create(product=product, image=image, is_primary=True)
-            
+        self._add_images(product, images, demote_existing=False)
         return product
 
     def update(self, instance, validated_data):
-        image = validated_data.pop('image', None)
+        images = self._pop_images(validated_data)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
-        
-        if image:
-            # Create new image and set as primary. 
-            # The ProductImage model's save() method will automatically unset is_primary for other images.
-            ProductImage.objects.create(product=instance, image=image, is_primary=True)
-            
+        self._add_images(instance, images)
         return instance
@@ -1,8 +1,14 @@
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
 from openpyxl.utils import get_column_letter
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.files import File
+from django.db.models import QuerySet
 from io import BytesIO
+from itertools import chain, islice
+import shutil
+import tempfile
+import zipfile
 
 class ExcelGenerator:
     """
@@ -16,46 +22,78 @@ class ExcelGenerator:
         self.worksheet = self.workbook.create_sheet(title=title)
         self.workbook.properties.creator = creator
         
-        # Styles
-        self.header_font = Font(bold=True, color="FFFFFF")
-        self.header_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid") # Indigo-600
-        self.header_alignment = Alignment(horizontal="center", vertical="center")
+        # Styles: one named header style, registered once per workbook
+        self.header_style = NamedStyle(
+            name="owl_header",
+            font=Font(bold=True, color="FFFFFF"),
+            fill=PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid"), # Indigo-600
+            alignment=Alignment(horizontal="center", vertical="center"),
+        )
+        self.workbook.add_named_style(self.header_style)
         
-    def generate(self, queryset, columns):
+    def generate(self, queryset, columns, chunk_size=None, output=None):
         """
         Generates Excel file stream.
-        :param queryset: Django QuerySet (will be iterated)
+        :param queryset: Django QuerySet (will be iterated); model instances or
+            values_list(named=True) rows. A plain iterator of rows also works.
         :param columns: List of dicts/tuples [('Header', 'field_name'), ...]
+        :param chunk_size: Rows per fetch; defaults to settings.EXPORT_CHUNK_SIZE.
+            Also required for iterator() to honour prefetch_related.
+        :param output: Writable file-like to save into; a rewound BytesIO is
+            returned when omitted.
         """
+        chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+
         # 1. Write Header
         header_row = []
         for col_def in columns:
             cell = openpyxl.cell.WriteOnlyCell(self.worksheet, value=col_def['header'])
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = self.header_alignment
+            cell.style = self.header_style.name
             header_row.append(cell)
         self.worksheet.append(header_row)
 
         # 2. Write Data (Iterator for memory efficiency)
-        for obj in queryset.iterator():
-            row = []
-            for col_def in columns:
-                value = self._get_value(obj, col_def['field'])
-                
-                # Optional: Formatter
-                if 'formatter' in col_def and callable(col_def['formatter']):
-                    value = col_def['formatter'](value)
-                
-                row.append(value)
-            self.worksheet.append(row)
+        accessors = [self._compile_accessor(col_def) for col_def in columns]
+        rows = queryset.iterator(chunk_size=chunk_size) if isinstance(queryset, QuerySet) else queryset
+        for obj in rows:
+            self.worksheet.append([accessor(obj) for accessor in accessors])
 
-        # 3. Save to Bytes
+        # 3. Save to the given stream, or to Bytes
+        if output is not None:
+            self.workbook.save(output)
+            return output
         output = BytesIO()
         self.workbook.save(output)
         output.seek(0)
         return output
 
+    def _compile_accessor(self, col_def):
+        """Build a per-row callable once per column (field lookup + formatter)."""
+        field = col_def['field']
+        formatter = col_def.get('formatter')
+        if not callable(formatter):
+            formatter = None
+
+        # Same results as _get_value, without a try block per cell
+        if callable(field):
+            getter = lambda obj: self._get_value(obj, field)
+        elif '.' not in field:
+            getter = lambda obj: getattr(obj, field, '')
+        else:
+            path = field.split('.')
+
+            def getter(obj):
+                value = obj
+                for attr in path:
+                    value = getattr(value, attr, '')
+                    if value is None:
+                        break
+                return value
+
+        if formatter:
+            return lambda obj: formatter(getter(obj))
+        return getter
+
     def _get_value(self, obj, field):
         """Helper to get value from object, supporting dot notation (category.name)"""
         try:
@@ -74,30 +112,57 @@ class ExcelGenerator:
 
 
 class ProductExportService:
-    @staticmethod
-    def export_to_excel(queryset):
-        generator = ExcelGenerator(title="Product List")
-        
-        # Declarative Column Configuration
-        columns = [
-            {'header': 'ID', 'field': 'id'},
-            {'header': 'SKU', 'field': 'sku'},
-            {'header': 'Product Name', 'field': 'name'},
-            {'header': 'Category', 'field': 'category.name'},
-            {'header': 'Brand', 'field': 'brand'},
-            {'header': 'Price', 'field': 'price', 'formatter': lambda x: float(x) if x else 0},
-            {'header': 'Sale Price', 'field': 'sale_price', 'formatter': lambda x: float(x) if x else 0},
-            {'header': 'Stock', 'field': 'stock'},
-            {'header': 'Active', 'field': 'is_active', 'formatter': lambda x: 'Yes' if x else 'No'},
-            {'header': 'Featured', 'field': 'is_featured', 'formatter': lambda x: 'Yes' if x else 'No'},
-            {'header': 'Created At', 'field': 'created_at', 'formatter': lambda x: x.strftime('%Y-%m-%d %H:%M') if x else ''},
-        ]
+    # Declarative Column Configuration
+    COLUMNS = [
+        {'header': 'ID', 'field': 'id', 'formatter': str},
+        {'header': 'SKU', 'field': 'sku'},
+        {'header': 'Product Name', 'field': 'name'},
+        {'header': 'Category', 'field': 'category__name'},
+        {'header': 'Brand', 'field': 'brand'},
+        {'header': 'Price', 'field': 'price', 'formatter': lambda x: float(x) if x else 0},
+        {'header': 'Sale Price', 'field': 'sale_price', 'formatter': lambda x: float(x) if x else 0},
+        {'header': 'Stock', 'field': 'stock'},
+        {'header': 'Active', 'field': 'is_active', 'formatter': lambda x: 'Yes' if x else 'No'},
+        {'header': 'Featured', 'field': 'is_featured', 'formatter': lambda x: 'Yes' if x else 'No'},
+        {'header': 'Created At', 'field': 'created_at', 'formatter': lambda x: x.strftime('%Y-%m-%d %H:%M') if x else ''},
+    ]
 
-        excel_file = generator.generate(queryset, columns)
+    @classmethod
+    def _rows(cls, queryset):
+        # Named rows instead of model instances; the join comes from the lookup
+        return queryset.values_list(*(col['field'] for col in cls.COLUMNS), named=True)
 
-        response = HttpResponse(
-            excel_file.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="products_export.xlsx"'
-        return response
+    @classmethod
+    def export_to_storage(cls, queryset, storage, name, rows_per_file=None):
+        """
+        Write the export to storage; returns the stored file name.
+        :param name: File name without extension; '.xlsx' is added, or '.zip'
+            when the rows are split over several workbooks.
+        :param rows_per_file: Rows per workbook; defaults to settings.EXPORT_ROWS_PER_FILE.
+        """
+        rows_per_file = rows_per_file or settings.EXPORT_ROWS_PER_FILE
+        rows = cls._rows(queryset).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+        first_part = ExcelGenerator(title="Product List").generate(islice(rows, rows_per_file), cls.COLUMNS)
+        next_row = next(rows, None)
+        if next_row is None:
+            return storage.save(f"{name}.xlsx", File(first_part))
+
+        # Workbooks are already deflated; store them in the zip as they are
+        with tempfile.TemporaryFile() as archive:
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+                rows = chain([next_row], rows)
+                part, excel_file = 1, first_part
+                while excel_file is not None:
+                    with zf.open(f"products_part{part}.xlsx", 'w') as dst:
+                        shutil.copyfileobj(excel_file, dst)
+                    next_row = next(rows, None)
+                    if next_row is None:
+                        break
+                    rows = chain([next_row], rows)
+                    part += 1
+                    excel_file = ExcelGenerator(title="Product List").generate(
+                        islice(rows, rows_per_file), cls.COLUMNS
+                    )
+            archive.seek(0)
+            return storage.save(f"{name}.zip", File(archive))
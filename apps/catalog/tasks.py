@@ -0,0 +1,76 @@
+"""Catalog background tasks - slow admin jobs run off the request thread."""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import storages
+from django.utils import timezone
+from apps.utils.background import run_on_executor
+from .services import ProductExportService
+
+logger = logging.getLogger('apps.catalog')
+
+# How long a finished export's status (and download link) stays available
+EXPORT_JOB_TIMEOUT = 60 * 60
+
+# Separate from the shared background pool: a few large exports would
+# otherwise delay transactional emails and GHN order creation; extra
+# exports wait here instead
+_export_executor = ThreadPoolExecutor(
+    max_workers=settings.EXPORT_MAX_WORKERS, thread_name_prefix='owls-export'
+)
+
+
+def export_job_key(job_id: str) -> str:
+    return f"catalog:export:{job_id}"
+
+
+def signed_export_url(name: str) -> Optional[str]:
+    """Signed URL that expires with the job status; None if the storage can't sign."""
+    storage = storages['exports']
+    if not getattr(storage, 'querystring_auth', False):
+        return None
+    return storage.url(name, expire=EXPORT_JOB_TIMEOUT)
+
+
+def generate_product_export(job_id: str, queryset) -> None:
+    """Build the product export file and record where to download it."""
+    try:
+        name = ProductExportService.export_to_storage(queryset, storages['exports'], f"products_{job_id}")
+    except Exception:
+        cache.set(export_job_key(job_id), {'status': 'failed'}, EXPORT_JOB_TIMEOUT)
+        raise
+    # Exports hold inactive products and stock levels: never a public link
+    cache.set(
+        export_job_key(job_id),
+        {'status': 'success', 'name': name, 'url': signed_export_url(name)},
+        EXPORT_JOB_TIMEOUT,
+    )
+    logger.info(f"Product export {job_id} written to {name}")
+
+
+def delete_expired_exports() -> None:
+    """Delete export files older than their job status, which nothing links to anymore."""
+    storage = storages['exports']
+    cutoff = timezone.now() - timedelta(seconds=EXPORT_JOB_TIMEOUT)
+    try:
+        _, files = storage.listdir('')
+    except FileNotFoundError:
+        return
+    for name in files:
+        if storage.get_modified_time(name) < cutoff:
+            storage.delete(name)
+            logger.info(f"Deleted expired product export {name}")
+
+
+def queue_product_export(queryset) -> str:
+    """Start a product export in the background; returns its job id."""
+    job_id = uuid.uuid4().hex
+    cache.set(export_job_key(job_id), {'status': 'pending'}, EXPORT_JOB_TIMEOUT)
+    # Sweep before each new export so storage never holds more than an hour's worth
+    run_on_executor(_export_executor, delete_expired_exports)
+    run_on_executor(_export_executor, generate_product_export, job_id, queryset)
+    return job_id
@@ -2,31 +2,38 @@ from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Max, Min, F, Case, When, DecimalField, Q
+from django.db.models import Q
+from django.core.files.storage import storages
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+import hashlib
 import operator
 from functools import reduce
+from django.core.cache import cache
 
-from .models import Category, Product, ProductImage
+from apps.utils.cache import CachedListMixin, cache_version
+from .models import CATALOG_CACHE_NAMESPACE, Category, Product, ProductImage
 from .serializers import CategorySerializer, ProductListSerializer, ProductDetailSerializer, ProductCreateSerializer
 from .filters import ProductFilter, ProductOrderingFilter
-from .services import ProductExportService
+from .tasks import export_job_key, queue_product_export
 
 class ProductPagination(PageNumberPagination):
     page_size = 9
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing and retrieving categories.
     """
-    queryset = Category.objects.filter(is_active=True)
+    queryset = Category.objects.with_product_count().filter(is_active=True).order_by('name')
     serializer_class = CategorySerializer
     lookup_field = 'slug'
+    cache_namespace = CATALOG_CACHE_NAMESPACE
+    list_cache_timeout = 60 * 15
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for public product listing and details.
     """
@@ -37,11 +44,21 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['name', 'description', 'brand']
     ordering_fields = ['price', 'created_at', 'name']
     lookup_field = 'slug'
+    cache_namespace = CATALOG_CACHE_NAMESPACE
+    facets_cache_timeout = 60 * 5
 
     def get_queryset(self):
         # Use Custom Manager for cleaner logic
         queryset = Product.objects.all() if self.request.user.is_staff else Product.objects.active()
-        return queryset.with_effective_price().select_related('category').prefetch_related('images')
+        # Aggregate annotations drop Meta.ordering; keep newest-first explicit
+        queryset = (
+            queryset.with_review_stats().with_discount_percent()
+            .order_by('-created_at').select_related('category')
+        )
+        if self.action == 'list':
+            # Thumbnail path only, and none of the detail-only text columns
+            return queryset.with_primary_image().defer('description', 'attributes')
+        return queryset.prefetch_related('images')
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -57,47 +74,46 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         # We leverage the same SearchFilter backend logic if possible, or simple Q logic if simple.
         # Here we manually apply to ensure we get context-aware facets.
         
-        products = Product.objects.active()
-
         category_slug = request.query_params.get('category__slug')
+        search_query = request.query_params.get('search')
+
+        # Same for every visitor (active products only); catalog saves bump the version
+        context_hash = hashlib.md5(
+            f"{category_slug or ''}\0{search_query or ''}".encode(), usedforsecurity=False
+        ).hexdigest()
+        cache_key = f"catalog:facets:{cache_version(CATALOG_CACHE_NAMESPACE)}:{context_hash}"
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        products = Product.objects.active()
         if category_slug:
             products = products.filter(category__slug=category_slug)
         
-        search_query = request.query_params.get('search')
         if search_query:
             # Replicate search logic consistent with list view
             search_fields = ['name__icontains', 'description__icontains', 'brand__icontains']
             q_objects = [Q(**{field: search_query}) for field in search_fields]
             products = products.filter(reduce(operator.or_, q_objects))
 
-        # Use efficient aggregation with effective_price from Manager if needed, 
-        # but aggregate() on annotated queryset works best if annotation is present.
-        # Since we started fresh from objects.active(), we need annotation again.
-        products = products.with_effective_price()
-
-        # Aggregate price range based on effective price
-        price_stats = products.aggregate(
-            min_price=Min('effective_price'), 
-            max_price=Max('effective_price')
-        )
+        # Price range, brands and colours from a single query
+        facets = products.facets()
         
-        # Get distinct brands and colors based on Context-filtered products
-        brands = products.exclude(brand__isnull=True).exclude(brand='').values_list('brand', flat=True).distinct().order_by('brand')
-        colors = products.exclude(color__isnull=True).exclude(color='').values_list('color', flat=True).distinct().order_by('color')
-        
-        return Response({
-            'min_price': price_stats['min_price'] or 0,
-            'max_price': price_stats['max_price'] or 0,
-            'brands': list(brands),
-            'colors': list(colors)
-        })
+        data = {
+            'min_price': facets['min_price'] or 0,
+            'max_price': facets['max_price'] or 0,
+            'brands': facets['brands'],
+            'colors': facets['colors']
+        }
+        cache.set(cache_key, data, self.facets_cache_timeout)
+        return Response(data)
 
 class AdminProductViewSet(viewsets.ModelViewSet):
     """
     Admin ViewSet for full CRUD operations on Products.
     """
     permission_classes = [permissions.IsAdminUser]
-    queryset = Product.objects.all().order_by('-created_at')
+    queryset = Product.objects.order_by('-created_at').select_related('category').with_primary_image()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = ProductFilter
     search_fields = ['name', 'sku']
@@ -112,10 +128,45 @@ class AdminProductViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='export')
     def export(self, request):
         """
-        Export products to Excel.
+        Start an Excel export of the filtered products; poll status_url for the file.
+        """
+        # Plain filtered rows; the exporter selects only its columns
+        queryset = self.filter_queryset(Product.objects.order_by('-created_at'))
+        job_id = queue_product_export(queryset)
+        return Response({
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': self.reverse_action('export-status', kwargs={'job_id': job_id}),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<job_id>[0-9a-f]{32})', url_name='export-status')
+    def export_status(self, request, job_id=None):
+        """
+        Status of an export job; includes the download url once it succeeded.
+        """
+        job = cache.get(export_job_key(job_id))
+        if job is None:
+            return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+        job = dict(job)
+        name = job.pop('name', None)
+        if name and not job.get('url'):
+            # Storage can't sign URLs (local disk): download through the admin API
+            job['url'] = self.reverse_action('export-download', kwargs={'job_id': job_id})
+        return Response({'job_id': job_id, **job})
+
+    @action(
+        detail=False, methods=['get'],
+        url_path=r'export/(?P<job_id>[0-9a-f]{32})/download', url_name='export-download',
+    )
+    def export_download(self, request, job_id=None):
+        """
+        Stream a finished export file; available as long as its job status.
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        return ProductExportService.export_to_excel(queryset)
+        job = cache.get(export_job_key(job_id))
+        if not job or not job.get('name'):
+            return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+        name = job['name']
+        return FileResponse(storages['exports'].open(name, 'rb'), as_attachment=True, filename=name)
 
 class AdminProductImageViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAdminUser]
@@ -126,7 +177,6 @@ class AdminProductImageViewSet(viewsets.ViewSet):
         Set an image as primary. PK is the Image ID.
         """
         image = get_object_or_404(ProductImage, pk=pk)
-        ProductImage.objects.filter(product=image.product).update(is_primary=False)
-        image.is_primary = True
+        image.is_primary = True  # save() demotes the previous primary
         image.save()
         return Response({'status': 'success', 'message': 'Image set as primary'})
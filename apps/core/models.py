@@ -1,7 +1,14 @@
+import copy
+import time
+from django.conf import settings
 from django.db import models
 from django.core.cache import cache
+from apps.utils.cache import bump_cache_version
 
 class SingletonModel(models.Model):
+    # Per-process copies: {class name: (instance, expires_at)}
+    _local_cache = {}
+
     class Meta:
         abstract = True
 
@@ -15,15 +22,29 @@ class SingletonModel(models.Model):
 
     @classmethod
     def load(cls):
-        if cache.get(cls.__name__):
-            return cache.get(cls.__name__)
-        obj, created = cls.objects.get_or_create(pk=1)
-        if not created:
-            obj.set_cache()
+        # Other workers see a save within SINGLETON_LOCAL_CACHE_TTL seconds
+        entry = cls._local_cache.get(cls.__name__)
+        if entry and time.monotonic() < entry[1]:
+            # Callers may edit the instance (admin update), so hand out a copy
+            return copy.deepcopy(entry[0])
+
+        obj = cache.get(cls.__name__)
+        if obj is None:
+            obj, created = cls.objects.get_or_create(pk=1)
+            if not created:
+                obj.set_cache()
+        cls._remember(obj)
         return obj
 
+    @classmethod
+    def _remember(cls, obj):
+        cls._local_cache[cls.__name__] = (
+            copy.deepcopy(obj), time.monotonic() + settings.SINGLETON_LOCAL_CACHE_TTL
+        )
+
     def set_cache(self):
         cache.set(self.__class__.__name__, self)
+        self._remember(self)
 
 class SiteConfig(SingletonModel):
     # General
@@ -54,6 +75,9 @@ class SiteConfig(SingletonModel):
     class Meta:
         verbose_name = "Site Configuration"
 
+TEAM_CACHE_NAMESPACE = 'team'
+
+
 class TeamMember(models.Model):
     name = models.CharField(max_length=255)
     role = models.CharField(max_length=255)
@@ -70,3 +94,12 @@ class TeamMember(models.Model):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_cache_version(TEAM_CACHE_NAMESPACE)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_cache_version(TEAM_CACHE_NAMESPACE)
+        return result
@@ -9,3 +9,12 @@ class StaticStorage(S3Boto3Storage):
 class MediaStorage(S3Boto3Storage):
     location = 'media'
     file_overwrite = False
+
+
+class ExportStorage(S3Boto3Storage):
+    """Private admin exports; only reachable through short-lived signed URLs."""
+    location = 'exports'
+    file_overwrite = False
+    default_acl = 'private'
+    custom_domain = None
+    querystring_auth = True
@@ -2,7 +2,8 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
-from .models import SiteConfig, TeamMember
+from apps.utils.cache import CachedListMixin
+from .models import TEAM_CACHE_NAMESPACE, SiteConfig, TeamMember
 from .serializers import SiteConfigSerializer, TeamMemberSerializer
 
 class SiteConfigViewSet(viewsets.ModelViewSet):
@@ -17,7 +18,13 @@ class SiteConfigViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(self.get_object())
         return Response(serializer.data)
 
-class TeamMemberViewSet(viewsets.ModelViewSet):
+class TeamMemberViewSet(CachedListMixin, viewsets.ModelViewSet):
     queryset = TeamMember.objects.filter(is_active=True).order_by('order', 'created_at')
     serializer_class = TeamMemberSerializer
     permission_classes = [AllowAny]
+    cache_namespace = TEAM_CACHE_NAMESPACE
+    # Saves/deletes bump the version; the timeout covers queryset.update()
+    list_cache_timeout = 60 * 15
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(TeamMemberViewSet, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:44
+
+from django.db import migrations, models
+
+
+def dedupe_default_addresses(apps, schema_editor):
+    # Keep one default per user (newest first, as the address list shows it)
+    UserAddress = apps.get_model('identity', 'UserAddress')
+    seen = set()
+    demote = []
+    for address_id, user_id in (
+        UserAddress.objects.filter(is_default=True)
+        .order_by('user_id', '-created_at', '-id')
+        .values_list('id', 'user_id')
+    ):
+        if user_id in seen:
+            demote.append(address_id)
+        seen.add(user_id)
+    UserAddress.objects.filter(pk__in=demote).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('identity', '0006_socialaccount'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_default_addresses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='useraddress',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('user',), name='uniq_default_address_per_user'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-15 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('identity', '0007_useraddress_uniq_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useraddress',
+            index=models.Index(fields=['user', '-is_default', '-created_at'], name='identity_us_user_id_6ab7dc_idx'),
+        ),
+    ]
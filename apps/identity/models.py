@@ -1,7 +1,7 @@
 """Identity app models - User and authentication related models."""
 import uuid
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -75,10 +75,18 @@ class User(AbstractUser):
     
     def record_failed_login(self):
         """Record failed login attempt and lock account if threshold exceeded."""
-        self.failed_login_attempts += 1
-        if self.failed_login_attempts >= 5:
-            self.locked_until = timezone.now() + timezone.timedelta(minutes=30)
-        self.save(update_fields=['failed_login_attempts', 'locked_until'])
+        # Increment in SQL so concurrent wrong passwords all count; the 5th locks
+        User.objects.filter(pk=self.pk).update(
+            failed_login_attempts=models.F('failed_login_attempts') + 1,
+            locked_until=models.Case(
+                models.When(
+                    failed_login_attempts__gte=4,
+                    then=models.Value(timezone.now() + timezone.timedelta(minutes=30)),
+                ),
+                default=models.F('locked_until'),
+            ),
+        )
+        self.refresh_from_db(fields=['failed_login_attempts', 'locked_until'])
     
     def reset_failed_logins(self):
         """Reset failed login counter on successful login."""
@@ -126,18 +134,43 @@ class UserAddress(models.Model):
         verbose_name = 'Địa chỉ giao hàng'
         verbose_name_plural = 'Địa chỉ giao hàng'
         ordering = ['-is_default', '-created_at']
+        indexes = [
+            # A user's address list, default first (also serves the first-address check)
+            models.Index(fields=['user', '-is_default', '-created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_default=True),
+                name='uniq_default_address_per_user',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.label} - {self.recipient_name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._was_default = dict(zip(field_names, values)).get('is_default', False)
+        return instance
+    
     def save(self, *args, **kwargs):
-        if self.is_default:
-            # Unset other defaults
-            UserAddress.objects.filter(user=self.user, is_default=True).update(is_default=False)
-        elif not UserAddress.objects.filter(user=self.user).exists():
+        if not self.is_default and self._state.adding:
             # First address is always default
-            self.is_default = True
-        super().save(*args, **kwargs)
+            self.is_default = not UserAddress.objects.filter(user_id=self.user_id).exists()
+        
+        # Unset the old default only when this address becomes the default;
+        # the partial unique index guarantees at most one either way
+        if self.is_default and not getattr(self, '_was_default', False):
+            with transaction.atomic():
+                UserAddress.objects.filter(
+                    user_id=self.user_id, is_default=True
+                ).exclude(pk=self.pk).update(is_default=False)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._was_default = self.is_default
     
     @property
     def full_address(self):
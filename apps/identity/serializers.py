@@ -1,6 +1,8 @@
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
 from django.contrib.auth.password_validation import validate_password
 from .models import UserAddress
 
@@ -144,8 +146,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 'message': 'Two-factor authentication required'
             }
         
-        # Get tokens
-        data = super().validate(attrs)
+        # Get tokens. authenticate_user already checked the password; super().validate()
+        # would run authenticate() and hash it a second time
+        if not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages['no_active_account'], 'no_active_account'
+            )
+        refresh = self.get_token(user)
+        data = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
         data['user'] = UserSerializer(self.user).data
         return data
 
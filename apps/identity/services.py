@@ -1,12 +1,14 @@
 """Identity services - Email verification, password reset, authentication logic."""
 import logging
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
 from typing import Optional
+from .tasks import queue_email
 
 logger = logging.getLogger('apps.identity')
 
@@ -16,30 +18,8 @@ class EmailService:
     
     @staticmethod
     def _send_email(subject: str, message: str, recipient_email: str, html_message: Optional[str] = None) -> bool:
-        """Send email asynchronously with error handling."""
-        import threading
-        
-        def _send():
-            try:
-                # print(f"DEBUG: Startup sending email to {recipient_email}...") 
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[recipient_email],
-                    html_message=html_message,
-                    fail_silently=False,
-                )
-                logger.info(f"Email sent successfully to {recipient_email}")
-                # print(f"DEBUG: Success sending email to {recipient_email}")
-            except Exception as e:
-                logger.error(f"Failed to send email to {recipient_email}: {e}")
-                # print(f"DEBUG: Error sending email: {e}")
-
-        # Execute in background thread (non-daemon to ensure completion)
-        email_thread = threading.Thread(target=_send, daemon=False)
-        email_thread.start()
-        
+        """Queue the email for background delivery (after commit); returns immediately."""
+        transaction.on_commit(lambda: queue_email(subject, message, recipient_email, html_message))
         return True
     
     @staticmethod
@@ -103,6 +83,10 @@ OWLS Store Team
         """Send order confirmation email."""
         subject = f"Xác nhận đơn hàng #{order.order_number} - OWLS Store"
         
+        # No-op if the caller prefetched; otherwise later order.items.all()
+        # calls (GHN weight after confirmation) reuse this fetch
+        prefetch_related_objects([order], 'items')
+        
         items_text = "\n".join([
             f"  - {item.product_name} x{item.quantity}: {item.subtotal:,.0f}đ"
             for item in order.items.all()
@@ -227,7 +211,10 @@ class AuthService:
         
         try:
             uid = urlsafe_base64_decode(uidb64).decode()
-            user = User.objects.get(pk=uid)
+            # Token hash inputs plus what the verify/reset callers touch
+            user = User.objects.only(
+                'id', 'email', 'password', 'last_login', 'is_email_verified', 'last_password_change'
+            ).get(pk=uid)
         except (TypeError, ValueError, OverflowError, User.DoesNotExist):
             return None, "Link không hợp lệ"
         
@@ -2,11 +2,21 @@ import pyotp
 import qrcode
 import io
 import base64
+import hashlib
 import secrets
+import hmac
+from functools import lru_cache
 from django.conf import settings
 from django.core.cache import cache
 from .services import EmailService
 
+
+@lru_cache(maxsize=1024)
+def _totp_for(secret):
+    # Retries and repeat logins reuse the TOTP built for the same secret
+    return pyotp.TOTP(secret)
+
+
 class TwoFactorService:
     @staticmethod
     def generate_secret():
@@ -24,11 +34,34 @@ class TwoFactorService:
     @staticmethod
     def generate_qr_code(uri):
         """Generates a base64 encoded QR code image from the URI."""
-        qr = qrcode.make(uri)
+        # Setup page reloads ask for the same (pending) secret's code again
+        cache_key = f"2fa_qr_{hashlib.sha256(uri.encode()).hexdigest()}"
+        cached = cache.get(cache_key)
+        if cached:
+            return cached
+
+        # Low error correction: the code is scanned from a screen, not print
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
+        qr.add_data(uri)
+        qr.make(fit=True)
         img_buffer = io.BytesIO()
-        qr.save(img_buffer, format='PNG')
+        qr.make_image().save(img_buffer, format='PNG')
         img_str = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-        return f"data:image/png;base64,{img_str}"
+        data_uri = f"data:image/png;base64,{img_str}"
+        cache.set(cache_key, data_uri, timeout=600)
+        return data_uri
+
+    @staticmethod
+    def _count_failure(key, timeout):
+        """Atomically add one to a failure counter; returns the new count."""
+        # INCR, not GET+SET: concurrent wrong guesses must each count
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # First failure (or the counter expired); add() loses to a racing creator
+            if cache.add(key, 1, timeout=timeout):
+                return 1
+            return cache.incr(key)
 
     @staticmethod
     def verify_totp(secret, code, user_id=None):
@@ -43,12 +76,11 @@ class TwoFactorService:
             if attempts >= 5:
                 return False  # Locked out
             
-        totp = pyotp.TOTP(secret)
-        is_valid = totp.verify(code)
+        is_valid = _totp_for(secret).verify(code)
         
         if user_id:
             if not is_valid:
-                cache.set(cache_key, attempts + 1, timeout=1800)  # 30 min lockout
+                TwoFactorService._count_failure(cache_key, timeout=1800)  # 30 min lockout
             else:
                 cache.delete(cache_key)  # Reset on success
         
@@ -57,12 +89,8 @@ class TwoFactorService:
     @staticmethod
     def generate_backup_codes(count=12, length=6):
         """Generates a list of random 6-digit backup codes."""
-        codes = []
-        for _ in range(count):
-            # Generate a 6-digit number string
-            token = "".join(secrets.choice("0123456789") for _ in range(length))
-            codes.append(token)
-        return codes
+        # One uniform draw per code, zero-padded to `length` digits
+        return [f"{secrets.randbelow(10 ** length):0{length}d}" for _ in range(count)]
 
     @staticmethod
     def verify_backup_code(user, code):
@@ -71,11 +99,18 @@ class TwoFactorService:
         If found, removes it (one-time use) and saves the user.
         Returns True if valid, False otherwise.
         """
-        if not user.backup_codes:
+        if not user.backup_codes or not code:
             return False
         
-        if code in user.backup_codes:
-            user.backup_codes.remove(code)
+        # Compare against every stored code so timing doesn't reveal a partial match
+        code = str(code).encode()
+        matched = None
+        for stored in user.backup_codes:
+            if hmac.compare_digest(str(stored).encode(), code):
+                matched = stored
+        
+        if matched is not None:
+            user.backup_codes.remove(matched)
             user.save(update_fields=['backup_codes'])
             return True
         return False
@@ -84,7 +119,7 @@ class TwoFactorService:
     def generate_email_otp(user):
         """Generates a 6-digit OTP, caches it, and sends via email."""
         # Generate 6 digit crypto secure OTP
-        otp = "".join(secrets.choice("0123456789") for _ in range(6))
+        otp = f"{secrets.randbelow(10 ** 6):06d}"
         
         # Cache for 5 minutes
         cache_key = f"email_2fa_{user.id}"
@@ -117,26 +152,24 @@ OWLS Store Team
         lock_key = f"2fa_email_lock_{user.id}"
         attempts_key = f"2fa_email_attempts_{user.id}"
         
-        if cache.get(lock_key):
+        cache_key = f"email_2fa_{user.id}"
+        
+        # Lock flag and OTP in one round trip
+        values = cache.get_many([lock_key, cache_key])
+        if values.get(lock_key):
             return False  # User is locked out
             
-        attempts = cache.get(attempts_key, 0)
+        cached_otp = values.get(cache_key)
         
-        cache_key = f"email_2fa_{user.id}"
-        cached_otp = cache.get(cache_key)
-        
-        if cached_otp and str(cached_otp) == str(code):
+        if cached_otp and hmac.compare_digest(str(cached_otp).encode(), str(code).encode()):
             # Invalidate after use and reset attempts
-            cache.delete(cache_key)
-            cache.delete(attempts_key)
+            cache.delete_many([cache_key, attempts_key])
             return True
         
         # Failed attempt
-        attempts += 1
+        attempts = TwoFactorService._count_failure(attempts_key, timeout=300)  # Track for 5 min
         if attempts >= 5:
             cache.set(lock_key, True, timeout=1800)  # 30 min lockout
             cache.delete(attempts_key)
-        else:
-            cache.set(attempts_key, attempts, timeout=300)  # Track for 5 min
         
         return False
@@ -0,0 +1,70 @@
+"""Identity background tasks - transactional email delivery."""
+import logging
+import threading
+import time
+from smtplib import SMTPException
+from typing import Iterable, Optional
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from apps.utils.background import run_in_background
+
+logger = logging.getLogger('apps.identity')
+
+# Attempts per email; transient SMTP errors back off 1s, 2s, ... between them
+EMAIL_SEND_ATTEMPTS = 3
+
+# Seconds a drain waits so a burst of emails shares one SMTP connection
+EMAIL_BATCH_DELAY = 1
+
+# Emails waiting for delivery; messages queued while a drain is pending share it
+_pending_emails = []
+_pending_lock = threading.Lock()
+
+
+def queue_email(subject: str, message: str, recipient_email: str, html_message: Optional[str] = None) -> None:
+    """Queue an email for delivery, coalescing bursts onto one SMTP connection."""
+    email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient_email])
+    if html_message:
+        email.attach_alternative(html_message, 'text/html')
+
+    with _pending_lock:
+        schedule_drain = not _pending_emails
+        _pending_emails.append(email)
+    if schedule_drain:
+        run_in_background(_drain_emails)
+
+
+def _drain_emails() -> None:
+    time.sleep(EMAIL_BATCH_DELAY)
+    with _pending_lock:
+        emails = list(_pending_emails)
+        _pending_emails.clear()
+    send_emails(emails)
+
+
+def send_emails(emails: Iterable[EmailMultiAlternatives]) -> None:
+    """Deliver emails over one SMTP connection, reconnecting when it drops."""
+    connection = get_connection(fail_silently=False)
+    try:
+        for email in emails:
+            recipient = ', '.join(email.to)
+            for attempt in range(1, EMAIL_SEND_ATTEMPTS + 1):
+                try:
+                    # Connects on the first message and after a drop; a no-op
+                    # while open, so send_messages() doesn't connect/quit per email
+                    connection.open()
+                    connection.send_messages([email])
+                    logger.info(f"Email sent successfully to {recipient}")
+                    break
+                except (SMTPException, OSError) as e:
+                    # Drop the (possibly dead) connection; the next attempt reconnects
+                    connection.close()
+                    if attempt == EMAIL_SEND_ATTEMPTS:
+                        logger.error(f"Failed to send email to {recipient}: {e}")
+                    else:
+                        time.sleep(2 ** (attempt - 1))
+                except Exception as e:
+                    logger.error(f"Failed to send email to {recipient}: {e}")
+                    break
+    finally:
+        connection.close()
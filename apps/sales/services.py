@@ -238,7 +238,7 @@ class OrderService:
             order=order,
             user=order.user,
             payment_method=order.payment_method,
-            amount=order.total,
+            amount=int(order.total),
         )
         
         return PaymentService.create_payment_url(payment, request)
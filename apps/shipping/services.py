@@ -1,12 +1,17 @@
 """GHN (Giao Hang Nhanh) Shipping API Integration."""
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any, List, Optional, Tuple
 from django.conf import settings
 from decimal import Decimal
 
 logger = logging.getLogger('apps.shipping')
 
+# Shared keep-alive session: back-to-back GHN calls reuse the TLS connection
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+
 
 class GHNService:
     """
@@ -45,9 +50,9 @@ class GHNService:
         
         try:
             if method == 'GET':
-                response = requests.get(url, headers=headers, params=data, timeout=30)
+                response = _session.get(url, headers=headers, params=data, timeout=30)
             else:
-                response = requests.post(url, headers=headers, json=data, timeout=30)
+                response = _session.post(url, headers=headers, json=data, timeout=30)
             
             result = response.json()
             
@@ -184,7 +189,7 @@ class GHNService:
                 'name': item.product_name[:200],
                 'quantity': item.quantity,
                 'price': int(item.price),
-                'code': str(item.product_id) if item.product else '',
+                'code': str(item.product_id) if item.product_id else '',
             })
         
         data = {
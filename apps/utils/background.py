@@ -0,0 +1,40 @@
+"""
+Background execution helpers for OWLS E-Commerce Platform.
+
+Slow side effects (third-party API calls, emails) are handed to a small
+shared thread pool so request threads return as soon as the database
+work is done.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+from django.db import connections, transaction
+
+logger = logging.getLogger('apps.utils')
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='owls-background')
+
+
+def run_in_background(func: Callable, *args, **kwargs) -> Future:
+    """Run func(*args, **kwargs) on the shared worker pool."""
+    return run_on_executor(_executor, func, *args, **kwargs)
+
+
+def run_on_executor(executor: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Future:
+    """Run func(*args, **kwargs) on a dedicated pool, e.g. for long jobs."""
+    def _run():
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Background task {func.__name__} failed: {e}")
+        finally:
+            # Worker threads open their own DB connections; don't leak them
+            connections.close_all()
+
+    return executor.submit(_run)
+
+
+def run_on_commit(func: Callable, *args, **kwargs) -> None:
+    """Schedule func in the background once the current transaction commits."""
+    transaction.on_commit(lambda: run_in_background(func, *args, **kwargs))
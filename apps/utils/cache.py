@@ -0,0 +1,59 @@
+"""
+Versioned response caching for OWLS E-Commerce Platform.
+
+Each namespace (catalog, team, ...) has a version number that is part of
+every cache key in it; bumping the version invalidates the whole namespace
+at once without having to find and delete individual keys.
+"""
+
+import hashlib
+import time
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def cache_version(namespace: str) -> int:
+    """Current version for cached responses in namespace (part of every key)."""
+    version = cache.get(f"{namespace}:version")
+    if version is None:
+        version = bump_cache_version(namespace)
+    return version
+
+
+def bump_cache_version(namespace: str) -> int:
+    """Invalidate every cached response in namespace."""
+    # Time-based so an evicted version key can never bring old entries back
+    version = time.time_ns()
+    cache.set(f"{namespace}:version", version, timeout=None)
+    return version
+
+
+class CachedListMixin:
+    """
+    Serve public list responses from cache. Keys carry the namespace version,
+    which model saves/deletes bump; the timeout bounds staleness for writes
+    that bypass save() (stock updates, bulk admin actions).
+    """
+    cache_namespace = None
+    list_cache_timeout = 60
+
+    def cached_response(self, request, render):
+        """Return render()'s data from cache, caching it on a miss."""
+        # Staff may see inactive rows; never share their responses
+        if request.user.is_staff:
+            return render()
+
+        url_hash = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+        cache_key = f"{self.cache_namespace}:{self.basename}:{cache_version(self.cache_namespace)}:{url_hash}"
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = render()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, response.data, self.list_cache_timeout)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedListMixin, self).list(request, *args, **kwargs))
@@ -92,6 +92,8 @@ DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=600)
 CACHES = {
     'default': env.cache('REDIS_URL', default='locmemcache://'),
 }
+# Seconds a worker reuses SiteConfig before asking the shared cache again
+SINGLETON_LOCAL_CACHE_TTL = env.int('SINGLETON_LOCAL_CACHE_TTL', default=30)
 
 # --- AUTHENTICATION ---
 AUTH_USER_MODEL = 'identity.User'
@@ -126,6 +128,7 @@ if USE_R2:
     STORAGES = {
         "default": {"BACKEND": "apps.core.storage.MediaStorage"},
         "staticfiles": {"BACKEND": "apps.core.storage.StaticStorage"},
+        "exports": {"BACKEND": "apps.core.storage.ExportStorage"},
     }
     
     STATIC_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/static/'
@@ -136,6 +139,16 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        # Outside MEDIA_ROOT so exports are never served as public media
+        "exports": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": BASE_DIR / 'exports'},
+        },
+    }
+
 # --- EMAIL ---
 EMAIL_BACKEND = 'apps.utils.email_backend.ForceIPv4EmailBackend'
 EMAIL_HOST = env('EMAIL_HOST', default='smtp.gmail.com')
@@ -260,6 +273,14 @@ LOGGING = {
     },
 }
 
+# --- EXPORT ---
+# Rows fetched per round trip when streaming Excel exports
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+# Larger exports are split into several workbooks, delivered as one zip
+EXPORT_ROWS_PER_FILE = env.int('EXPORT_ROWS_PER_FILE', default=100_000)
+# Worker threads for admin exports, separate from the shared background pool
+EXPORT_MAX_WORKERS = env.int('EXPORT_MAX_WORKERS', default=1)
+
 # --- SOCIAL AUTH ---
 GITHUB_CLIENT_ID = env('GITHUB_CLIENT_ID', default='')
 GITHUB_CLIENT_SECRET = env('GITHUB_CLIENT_SECRET', default='')